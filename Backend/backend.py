@@ -1,19 +1,127 @@
 import os
-import json
-from typing import List, Dict
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Iterator, Optional
 from groq import Groq
 from datetime import datetime
 
+# All sessions share one append-only SQLite database in WAL mode
+CHAT_DIR = "chat"
+CHAT_DB_PATH = os.path.join(CHAT_DIR, "chat_history.db")
+MAX_STORED_MESSAGES = 15  # per session, matches what is reloaded into context
+TRIM_EVERY = 50  # inserts per session between trims of old rows
+
+# Writes are queued and applied by a background thread so requests never wait on disk I/O
+_WRITE_Q = queue.SimpleQueue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+_STOP = object()
+
+# One Groq client (and connection pool) shared by every session
+_groq_client = None
+_groq_client_lock = threading.Lock()
+
+def get_groq_client() -> Groq:
+    """Return the shared Groq client, creating it on first use.
+
+    Created lazily rather than at import so GROQ_API_KEY from a .env file
+    loaded after this module is imported is still picked up.
+    """
+    global _groq_client
+    with _groq_client_lock:
+        if _groq_client is None:
+            api_key = os.getenv("GROQ_API_KEY")
+            print(f"[Backend] API Key present: {bool(api_key)}")
+            print(f"[Backend] API Key length: {len(api_key) if api_key else 0}")
+            # The SDK's default httpx client already pools keep-alive connections
+            _groq_client = Groq(api_key=api_key)
+            print(f"[Backend] Groq client initialized successfully")
+        return _groq_client
+
+def format_timestamp(timestamp) -> str:
+    """Format a stored timestamp (epoch seconds) as ISO 8601 for display"""
+    if isinstance(timestamp, str):
+        try:
+            timestamp = float(timestamp)
+        except ValueError:
+            return timestamp  # already ISO formatted
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+def _connect(db_path: str = CHAT_DB_PATH) -> sqlite3.Connection:
+    """Open the chat database, creating the schema if needed"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS messages ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "session_id TEXT NOT NULL, "
+        "role TEXT NOT NULL, "
+        "content TEXT NOT NULL, "
+        "timestamp REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+    return conn
+
+def _drain():
+    """Apply queued writes; runs on the background writer thread"""
+    conn = _connect()
+    inserts_since_trim: Dict[str, int] = {}
+    while True:
+        op = _WRITE_Q.get()
+        if op is _STOP:
+            break
+        try:
+            if op[0] == "insert":
+                _, session_id, role, content, timestamp = op
+                conn.execute(
+                    "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                    (session_id, role, content, timestamp)
+                )
+                count = inserts_since_trim.get(session_id, 0) + 1
+                if count >= TRIM_EVERY:
+                    conn.execute(
+                        "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                        "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                        (session_id, session_id, MAX_STORED_MESSAGES)
+                    )
+                    count = 0
+                inserts_since_trim[session_id] = count
+            elif op[0] == "clear":
+                _, session_id = op
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                inserts_since_trim.pop(session_id, None)
+        except Exception as e:
+            print(f"[Backend] ERROR writing chat history: {e}")
+    conn.close()
+
+def _enqueue_write(op: tuple):
+    """Queue a database write, starting the writer thread on first use"""
+    global _writer_thread
+    # Started lazily so a forked server worker gets its own thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_drain, name="chat-history-writer", daemon=True)
+            _writer_thread.start()
+    _WRITE_Q.put(op)
+
+@atexit.register
+def _flush_writes():
+    """Let the writer finish pending writes on interpreter shutdown"""
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _WRITE_Q.put(_STOP)
+        _writer_thread.join(timeout=5)
+
 class CachedChatHistory:
     def __init__(self, session_id: str = "default"):
-        api_key = os.getenv("GROQ_API_KEY")
         print(f"[Backend] Initializing CachedChatHistory for session: {session_id}")
-        print(f"[Backend] API Key present: {bool(api_key)}")
-        print(f"[Backend] API Key length: {len(api_key) if api_key else 0}")
         
         try:
-            self.client = Groq(api_key=api_key)
-            print(f"[Backend] Groq client initialized successfully")
+            self.client = get_groq_client()
         except Exception as e:
             print(f"[Backend] ERROR initializing Groq client: {e}")
             raise
@@ -22,13 +130,11 @@ class CachedChatHistory:
         self.session_id = session_id
         
         # Create chat directory if it doesn't exist
-        self.chat_dir = "chat"
+        self.chat_dir = CHAT_DIR
         if not os.path.exists(self.chat_dir):
             os.makedirs(self.chat_dir)
             print(f"[Backend] Created chat directory: {self.chat_dir}")
         
-        self.cache_file = os.path.join(self.chat_dir, f"chat_history_{session_id}.json")
-        
         # STRICT SYSTEM PROMPT
         self.system_prompt = """You are an expert on small fishes in Bangladesh. 
 Your ONLY purpose is to answer questions about small fishes found in Bangladesh.
@@ -50,42 +156,82 @@ Examples of unacceptable questions (you must politely refuse):
 - "What about sharks?" → "Sorry, sharks are not small fishes. I can only answer about small fishes in Bangladesh."
 """
         
-        self.conversation_history: List[Dict] = self._load_history()
+        self.system_message = {"role": "system", "content": self.system_prompt}
+        # Ring buffer of recent messages (system prompt kept separately); appends evict the oldest
+        self.conversation_history: deque = deque(self._load_history(), maxlen=MAX_STORED_MESSAGES)
+        # Iterating a deque while another thread appends raises RuntimeError, so all
+        # access goes through this lock (readers use history_snapshot())
+        self._history_lock = threading.Lock()
         
     def _load_history(self) -> List[Dict]:
-        """Load chat history from file"""
+        """Load the most recent chat history from the database"""
+        conn = _connect()
         try:
-            with open(self.cache_file, 'r') as f:
-                data = json.load(f)
-                return data.get("messages", [])
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Initialize with system prompt
-            return [{"role": "system", "content": self.system_prompt}]
+            rows = conn.execute(
+                "SELECT role, content, timestamp FROM messages "
+                "WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, MAX_STORED_MESSAGES)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"role": role, "content": content, "timestamp": timestamp}
+            for role, content, timestamp in reversed(rows)
+        ]
     
-    def _save_history(self):
-        """Save chat history to file"""
-        history_data = {
-            "session_id": self.session_id,
-            "last_updated": datetime.now().isoformat(),
-            "messages": self.conversation_history
-        }
-        with open(self.cache_file, 'w') as f:
-            json.dump(history_data, f, indent=2)
+    def _save_message(self, message: Dict):
+        """Queue a single message to be appended to the database"""
+        _enqueue_write(("insert", self.session_id, message["role"], message["content"], message["timestamp"]))
     
     def add_to_history(self, role: str, content: str):
         """Add a message to conversation history"""
-        self.conversation_history.append({
+        message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        # Keep last 15 messages + system prompt to avoid context overflow
-        if len(self.conversation_history) > 16:  # 1 system + 15 conversation
-            # Keep system prompt and recent messages
-            system_msg = self.conversation_history[0]
-            recent_msgs = self.conversation_history[-15:]
-            self.conversation_history = [system_msg] + recent_msgs
-        self._save_history()
+            "timestamp": time.time()  # formatted only when displayed
+        }
+        # deque(maxlen=15) drops the oldest message to avoid context overflow
+        with self._history_lock:
+            self.conversation_history.append(message)
+        self._save_message(message)
+    
+    def history_snapshot(self) -> List[Dict]:
+        """Return a copy of the conversation history that is safe to iterate"""
+        with self._history_lock:
+            return list(self.conversation_history)
+    
+    def _build_api_messages(self, pending: Optional[Dict] = None) -> List[Dict]:
+        """Prepare messages for API - system prompt + last 10 conversation messages
+
+        ``pending`` is a message not yet in the history (it is sent as the newest one).
+        """
+        # Take only last 10 conversation messages (5 exchanges)
+        limit = 9 if pending else 10
+        history = self.history_snapshot()
+        recent_conversation = history[-limit:]
+        if pending:
+            recent_conversation.append(pending)
+        
+        # Combine system prompt with recent conversation, removing the timestamp field for API
+        api_messages = [self.system_message] + [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in recent_conversation
+        ]
+        
+        print(f"[Backend] Total messages in full history: {len(history)}")
+        print(f"[Backend] Sending to API: 1 system + {len(recent_conversation)} conversation messages = {len(api_messages)} total")
+        return api_messages
+    
+    def _create_completion(self, api_messages: List[Dict], stream: bool = False):
+        """Call API with system prompt + recent conversation"""
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=api_messages,
+            temperature=0.3,  # Lower temperature for more consistent responses
+            max_tokens=512,
+            top_p=0.9,
+            stream=stream
+        )
     
     def get_response(self, user_message: str) -> str:
         """Get response using full chat history"""
@@ -97,34 +243,7 @@ Examples of unacceptable questions (you must politely refuse):
         
         try:
             print(f"[Backend] Calling Groq API with model: {self.model}")
-            
-            # Prepare messages for API - system prompt + last 10 conversation messages
-            system_msg = [msg for msg in self.conversation_history if msg["role"] == "system"]
-            conversation_msgs = [msg for msg in self.conversation_history if msg["role"] != "system"]
-            
-            # Take only last 10 conversation messages (5 exchanges)
-            recent_conversation = conversation_msgs[-10:] if len(conversation_msgs) > 10 else conversation_msgs
-            
-            # Combine system prompt with recent conversation
-            messages_to_send = system_msg + recent_conversation
-            
-            # Remove timestamp field for API
-            api_messages = [
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in messages_to_send
-            ]
-            
-            print(f"[Backend] Total messages in full history: {len(self.conversation_history)}")
-            print(f"[Backend] Sending to API: 1 system + {len(recent_conversation)} conversation messages = {len(api_messages)} total")
-            
-            # Call API with system prompt + recent conversation
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=api_messages,
-                temperature=0.3,  # Lower temperature for more consistent responses
-                max_tokens=512,
-                top_p=0.9
-            )
+            completion = self._create_completion(self._build_api_messages())
             
             print(f"[Backend] API call successful")
             assistant_response = completion.choices[0].message.content
@@ -142,25 +261,52 @@ Examples of unacceptable questions (you must politely refuse):
             print(f"[Backend] Full error: {repr(e)}")
             return error_msg
     
+    def stream_response(self, user_message: str) -> Iterator[str]:
+        """Yield the response in chunks as they arrive.
+
+        The exchange is added to history only once the stream completes; if the
+        client disconnects or the API fails mid-stream, neither the user message
+        nor the partial reply is recorded.
+        """
+        print(f"[Backend] stream_response called with message: {user_message[:50]}...")
+        
+        pending = {"role": "user", "content": user_message}
+        print(f"[Backend] Calling Groq API (streaming) with model: {self.model}")
+        stream = self._create_completion(self._build_api_messages(pending), stream=True)
+        
+        chunks = []
+        try:
+            for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    chunks.append(content)
+                    yield content
+        finally:
+            # Release the pooled connection even on client disconnect (GeneratorExit) or API error
+            stream.close()
+        
+        assistant_response = "".join(chunks)
+        print(f"[Backend] Streamed response complete: {assistant_response[:50]}...")
+        
+        # Add the completed exchange to history
+        self.add_to_history("user", user_message)
+        self.add_to_history("assistant", assistant_response)
+    
     def clear_history(self):
         """Clear conversation history (keep system prompt)"""
-        system_prompt = [msg for msg in self.conversation_history if msg["role"] == "system"]
-        if not system_prompt:
-            system_prompt = [{"role": "system", "content": self.system_prompt}]
-        self.conversation_history = system_prompt
-        self._save_history()
+        with self._history_lock:
+            self.conversation_history.clear()
+        _enqueue_write(("clear", self.session_id))
         print(f"Chat history cleared for session: {self.session_id} (kept system prompt)")
     
     def show_history(self):
         """Display conversation history"""
         print(f"\n=== Chat History ({self.session_id}) ===")
-        for i, msg in enumerate(self.conversation_history):
+        print("0. SYSTEM: System prompt loaded...")
+        for i, msg in enumerate(self.history_snapshot(), start=1):
             role = msg["role"].upper()
-            if role == "SYSTEM":
-                content = "System prompt loaded..."
-            else:
-                content = msg["content"][:80] + "..." if len(msg["content"]) > 80 else msg["content"]
-            print(f"{i}. {role}: {content}")
+            content = msg["content"][:80] + "..." if len(msg["content"]) > 80 else msg["content"]
+            print(f"{i}. [{format_timestamp(msg['timestamp'])}] {role}: {content}")
         print("=" * 40)
     
     def show_system_prompt(self):
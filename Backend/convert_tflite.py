@@ -0,0 +1,77 @@
+"""
+One-time post-training INT8 quantization of the trained Keras model for CPU inference.
+
+Run from the project root, pointing at a directory of held-out fish photos
+(roughly 100-500 images covering all classes, e.g. one sub-folder per class):
+
+    python -m Backend.convert_tflite path/to/calibration_images
+
+The directory can also be given with the FISH_CALIBRATION_DIR environment variable.
+The quantized model is written to Backend/model/convnextnet_int8.tflite and is picked
+up automatically by image_classification.load_model_once() on hosts without a GPU.
+"""
+import os
+import sys
+import argparse
+import tensorflow as tf
+
+from Backend.image_classification import load_custom_model, preprocess_image, KERAS_MODEL_PATH, TFLITE_MODEL_PATH
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+MIN_CALIBRATION_IMAGES = 100
+
+def find_calibration_images(image_dir):
+    """Return all image files under image_dir (searched recursively), sorted"""
+    paths = []
+    for dirpath, _, filenames in os.walk(image_dir):
+        for name in filenames:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, name))
+    return sorted(paths)
+
+def make_representative_dataset(image_paths):
+    """Build the generator used to calibrate activation ranges"""
+    def representative_dataset():
+        for path in image_paths:
+            # The Keras model's input is float32 pixels in [0, 255]
+            yield [tf.cast(preprocess_image(path), tf.float32)]
+    return representative_dataset
+
+def convert_to_tflite(model_path, output_path, image_paths):
+    """Quantize the model to INT8 weights and activations with uint8 image input"""
+    model = load_custom_model(model_path)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = make_representative_dataset(image_paths)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+
+    tflite_model = converter.convert()
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    print(f"[ConvertTFLite] INT8 model written to: {output_path} ({len(tflite_model)} bytes)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the fish classifier to INT8 TFLite")
+    parser.add_argument(
+        "calibration_dir",
+        nargs="?",
+        default=os.getenv("FISH_CALIBRATION_DIR"),
+        help="directory of held-out fish images covering all classes (or set FISH_CALIBRATION_DIR)"
+    )
+    args = parser.parse_args()
+
+    if not args.calibration_dir or not os.path.isdir(args.calibration_dir):
+        parser.error("a calibration image directory is required (argument or FISH_CALIBRATION_DIR)")
+
+    image_paths = find_calibration_images(args.calibration_dir)
+    if not image_paths:
+        print(f"[ConvertTFLite] ERROR: no images found in {args.calibration_dir}")
+        sys.exit(1)
+    if len(image_paths) < MIN_CALIBRATION_IMAGES:
+        print(f"[ConvertTFLite] WARNING: only {len(image_paths)} calibration images; "
+              f"{MIN_CALIBRATION_IMAGES}-500 covering all classes are recommended")
+    print(f"[ConvertTFLite] Calibrating with {len(image_paths)} images from {args.calibration_dir}")
+
+    convert_to_tflite(KERAS_MODEL_PATH, TFLITE_MODEL_PATH, image_paths)
@@ -0,0 +1,50 @@
+"""
+One-time conversion of the trained Keras model to a TF-TRT (FP16) SavedModel.
+
+Run from the project root on a machine with an NVIDIA GPU and TensorRT:
+
+    python -m Backend.convert_trt
+
+The optimized model is written to Backend/model/convnextnet_trt and is picked up
+automatically by image_classification.load_model_once() when a GPU is present.
+"""
+import os
+import tensorflow as tf
+from tensorflow.python.compiler.tensorrt import trt_convert as trt
+
+from Backend.image_classification import load_custom_model, MODEL_DIR, KERAS_MODEL_PATH, TRT_MODEL_DIR, MAX_BATCH_SIZE
+
+SAVED_MODEL_DIR = os.path.join(MODEL_DIR, "convnextnet_savedmodel")
+
+def export_saved_model(model_path, saved_model_dir):
+    """Export the Keras .h5 model as a SavedModel with a serving_default signature"""
+    model = load_custom_model(model_path)
+    if hasattr(model, 'export'):
+        model.export(saved_model_dir)
+    else:
+        tf.saved_model.save(model, saved_model_dir)
+    print(f"[ConvertTRT] SavedModel written to: {saved_model_dir}")
+
+def convert_to_trt(saved_model_dir, output_dir, input_shape=(224, 224, 3), max_batch_size=MAX_BATCH_SIZE):
+    """Convert a SavedModel to a TF-TRT engine with FP16 precision"""
+    converter = trt.TrtGraphConverterV2(
+        input_saved_model_dir=saved_model_dir,
+        precision_mode=trt.TrtPrecisionMode.FP16
+    )
+    converter.convert()
+
+    # Build the engines ahead of time so the first request does not pay for it;
+    # an engine built for the largest batch also serves every smaller batch
+    def input_fn():
+        yield (tf.zeros((max_batch_size, *input_shape), tf.float32),)
+
+    converter.build(input_fn=input_fn)
+    converter.save(output_dir)
+    print(f"[ConvertTRT] TensorRT model written to: {output_dir}")
+
+if __name__ == "__main__":
+    if not tf.config.list_physical_devices('GPU'):
+        print("[ConvertTRT] WARNING: no GPU detected, TensorRT conversion will likely fail")
+
+    export_saved_model(KERAS_MODEL_PATH, SAVED_MODEL_DIR)
+    convert_to_trt(SAVED_MODEL_DIR, TRT_MODEL_DIR)
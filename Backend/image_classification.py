@@ -5,7 +5,13 @@ from tensorflow.keras.layers import GlobalAveragePooling2D, Dense, Dropout
 from tensorflow.keras.regularizers import l2
 from tensorflow.keras.applications.convnext import ConvNeXtTiny
 import os
+import hashlib
+import queue
+import threading
 from PIL import Image
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -33,7 +39,8 @@ def load_custom_model(model_path):
         convnextnet_base = ConvNeXtTiny(
             weights=None,  # We'll load weights from saved model
             include_top=False,
-            input_shape=(224, 224, 3)
+            input_shape=(224, 224, 3),
+            include_preprocessing=True  # normalization of [0, 255] input is part of the model
         )
         
         # Freeze layers (same as training)
@@ -52,45 +59,50 @@ def load_custom_model(model_path):
         print("Model rebuilt and weights loaded!")
         return model
 
+@tf.function(input_signature=[tf.TensorSpec([], tf.string), tf.TensorSpec([2], tf.int32)])
+def _decode_and_resize(image_path, target_size):
+    """Read, decode and resize an image file in a single graph"""
+    raw = tf.io.read_file(image_path)
+    # decode_image handles JPEG, PNG, GIF and BMP; channels=3 also converts grayscale/RGBA to RGB
+    img = tf.io.decode_image(raw, channels=3, expand_animations=False)
+    # Bicubic with antialiasing to match PIL's Image.resize used during training
+    img = tf.image.resize(img, target_size, method='bicubic', antialias=True)
+    # Back to uint8 (as PIL produced) so queued/batched input is 4x smaller than float32
+    img = tf.cast(tf.clip_by_value(tf.round(img), 0.0, 255.0), tf.uint8)
+    return tf.expand_dims(img, axis=0)
+
+def _decode_with_pil(image_path, target_size):
+    """Fallback decoder for formats TensorFlow cannot read (e.g. TIFF, WebP)"""
+    with Image.open(image_path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img = img.resize(target_size)
+        img_array = np.asarray(img, dtype=np.uint8)
+    return tf.expand_dims(tf.convert_to_tensor(img_array), axis=0)
+
 def preprocess_image(image_path, target_size=(224, 224)):
     """Preprocess image in the same way as training"""
-    # Load image
-    img = Image.open(image_path)
-    
-    # Convert to RGB if necessary
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    # Resize to target size
-    img = img.resize(target_size)
-    
-    # Convert to numpy array
-    img_array = np.array(img)
-    
-    # Convert to tensor and add batch dimension
-    img_array = tf.convert_to_tensor(img_array, dtype=tf.float32)
-    img_array = tf.expand_dims(img_array, axis=0)
-    
-    # Note: ConvNeXt models typically expect images in range [0, 255]
-    # The model's preprocessing is usually handled internally
-    return img_array, img
+    # No rescaling here: the ConvNeXt backbone takes raw [0, 255] pixels and
+    # normalizes them in its first layers, where it runs inside the compiled graph
+    try:
+        return _decode_and_resize(tf.constant(image_path), tf.constant(target_size, dtype=tf.int32))
+    except tf.errors.InvalidArgumentError:
+        print(f"[ImageClassification] TensorFlow cannot decode {image_path}, falling back to PIL")
+        return _decode_with_pil(image_path, target_size)
 
 def predict_single_image(model, image_path, class_names=None):
     """Make prediction on a single image"""
     
     # Preprocess the image
-    img_array, original_img = preprocess_image(image_path)
+    img_array = preprocess_image(image_path)
     
     # Make prediction
-    predictions = model.predict(img_array, verbose=0)
+    predictions = _run_inference(model, img_array)
     
     # Get predicted class and confidence
     predicted_class_idx = np.argmax(predictions[0])
     confidence = predictions[0][predicted_class_idx]
     
-    # Get top 3 predictions
-    top_3_indices = np.argsort(predictions[0])[-3:][::-1]
-    
     # Print detailed results
     print("\n" + "="*50)
     print("PREDICTION RESULTS")
@@ -127,21 +139,189 @@ CLASS_NAMES = [
     'Puti',
     'Tengra'
 ]
+# Lowercased once for the filename fallback
+_CLASS_NAMES_LOWER = tuple((name.lower(), name) for name in CLASS_NAMES)
+
+# Model locations
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "model")
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, "convnextnet_model.h5")
+TRT_MODEL_DIR = os.path.join(MODEL_DIR, "convnextnet_trt")  # produced by convert_trt.py
+TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, "convnextnet_int8.tflite")  # produced by convert_tflite.py
 
 # Global model instance
 _model = None
 _model_loaded = False
 _model_error = None
+_model_backend = None
+_infer = None
+
+def build_inference_fn(model, input_shape=(224, 224, 3)):
+    """Trace the model once into a graph-mode concrete function.
+
+    Calling the concrete function skips the eager per-op dispatch and the
+    Dataset/callback machinery of ``model.predict``; the batch dimension is
+    left open so any batch size reuses the same trace. Input is uint8 and is
+    cast to float32 inside the graph.
+    """
+    spec = tf.TensorSpec([None, *input_shape], tf.uint8)
+    forward = lambda x: model(tf.cast(x, tf.float32), training=False)
+    try:
+        concrete = tf.function(forward, jit_compile=True).get_concrete_function(spec)
+        # XLA compiles once per input shape; warm up every padded batch size the
+        # batcher can produce so no compilation lands on a live request
+        batch_size = 1
+        while True:
+            concrete(tf.zeros((batch_size, *input_shape), tf.uint8))
+            if batch_size >= MAX_BATCH_SIZE:
+                break
+            batch_size = _padded_batch_size(batch_size + 1)
+    except Exception as e:
+        print(f"[ImageClassification] XLA compilation unavailable ({e}), using plain graph mode")
+        concrete = tf.function(forward).get_concrete_function(spec)
+        concrete(tf.zeros((1, *input_shape), tf.uint8))
+    return concrete
+
+def load_trt_inference_fn(saved_model_dir):
+    """Load a TF-TRT SavedModel and return (model, inference function)"""
+    trt_model = tf.saved_model.load(saved_model_dir)
+    signature = trt_model.signatures['serving_default']
+    # Signature functions only accept keyword arguments
+    input_name = next(iter(signature.structured_input_signature[1]))
+
+    def infer(x):
+        outputs = signature(**{input_name: tf.cast(x, tf.float32)})
+        return next(iter(outputs.values()))
+
+    return trt_model, infer
+
+def load_tflite_inference_fn(model_path):
+    """Load an INT8 TFLite model and return (interpreter, inference function)"""
+    interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=os.cpu_count())
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_index = interpreter.get_output_details()[0]['index']
+    input_scale, input_zero_point = input_details['quantization']
+    input_dtype = input_details['dtype']
+    # The interpreter holds mutable tensor buffers, so invocations must not overlap
+    lock = threading.Lock()
+
+    def infer(x):
+        x = np.asarray(x)
+        if input_scale and (input_scale, input_zero_point) != (1.0, 0):
+            # Quantized input: map pixel values through the input quantization parameters
+            x = np.round(x.astype(np.float32) / input_scale + input_zero_point).clip(0, 255).astype(input_dtype)
+        elif x.dtype != input_dtype:
+            x = x.astype(input_dtype)
+        outputs = []
+        with lock:
+            for sample in x:
+                interpreter.set_tensor(input_details['index'], sample[np.newaxis, ...])
+                interpreter.invoke()
+                outputs.append(interpreter.get_tensor(output_index)[0])
+        return tf.convert_to_tensor(np.stack(outputs))
+
+    return interpreter, infer
+
+# Opportunistic batching: concurrent requests arriving within the window share one forward pass
+BATCH_WINDOW_SECONDS = 0.01
+MAX_BATCH_SIZE = 32
+PREDICTION_TIMEOUT_SECONDS = 30
+
+_batch_queue = queue.Queue()
+_batch_thread = None
+_batch_thread_lock = threading.Lock()
+
+def _padded_batch_size(n):
+    """Round up to a power of two so the compiled function sees only a few distinct shapes"""
+    size = 1
+    while size < n:
+        size *= 2
+    return min(size, MAX_BATCH_SIZE)
+
+def _batch_worker():
+    """Drain queued requests, run them as one batch and hand each caller its rows"""
+    while True:
+        batch = [_batch_queue.get()]
+        deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_batch_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        batch = [(arr, future) for arr, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            continue
+        
+        try:
+            stacked = np.concatenate([arr for arr, _ in batch])
+            # Only the XLA-compiled Keras function benefits from fixed shapes; TFLite runs one
+            # pass per row and the TRT engine serves any batch up to its build size
+            padded_size = _padded_batch_size(len(stacked)) if _model_backend == 'keras' else len(stacked)
+            if padded_size > len(stacked):
+                padding = np.zeros((padded_size - len(stacked), *stacked.shape[1:]), dtype=stacked.dtype)
+                stacked = np.concatenate([stacked, padding])
+            predictions = _infer(tf.convert_to_tensor(stacked)).numpy()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            continue
+        
+        offset = 0
+        for arr, future in batch:
+            future.set_result(predictions[offset:offset + len(arr)])
+            offset += len(arr)
+
+def _submit_to_batch(img_array):
+    """Queue a (1, H, W, C) array for batched inference and return a Future of its predictions"""
+    global _batch_thread
+    # Started lazily so a forked server worker gets its own thread
+    with _batch_thread_lock:
+        if _batch_thread is None or not _batch_thread.is_alive():
+            _batch_thread = threading.Thread(target=_batch_worker, name="inference-batcher", daemon=True)
+            _batch_thread.start()
+    
+    future = Future()
+    _batch_queue.put((np.asarray(img_array), future))
+    return future
+
+def _run_inference(model, img_array):
+    """Run a forward pass, batching requests through the cached inference function for the global model"""
+    if model is _model and _infer is not None:
+        return _submit_to_batch(img_array).result(timeout=PREDICTION_TIMEOUT_SECONDS)
+    # Calling the model directly avoids predict()'s data-adapter/callback setup
+    return model(tf.cast(img_array, tf.float32), training=False).numpy()
 
 def load_model_once():
     """Load the model once and cache it"""
-    global _model, _model_loaded, _model_error
+    global _model, _model_loaded, _model_error, _model_backend, _infer
     
     if _model_loaded:
         return _model
     
     try:
-        model_path = os.path.join(os.path.dirname(__file__), "model", "convnextnet_model.h5")
+        # Prefer the TensorRT engine when it has been built and a GPU is available
+        if os.path.isdir(TRT_MODEL_DIR) and tf.config.list_physical_devices('GPU'):
+            print(f"[ImageClassification] Loading TensorRT model from: {TRT_MODEL_DIR}")
+            _model, _infer = load_trt_inference_fn(TRT_MODEL_DIR)
+            _model_backend = 'tensorrt'
+            _model_loaded = True
+            print("[ImageClassification] TensorRT model loaded successfully!")
+            return _model
+        
+        # On CPU-only hosts prefer the quantized TFLite model when it has been built
+        if os.path.exists(TFLITE_MODEL_PATH) and not tf.config.list_physical_devices('GPU'):
+            print(f"[ImageClassification] Loading INT8 TFLite model from: {TFLITE_MODEL_PATH}")
+            _model, _infer = load_tflite_inference_fn(TFLITE_MODEL_PATH)
+            _model_backend = 'tflite'
+            _model_loaded = True
+            print("[ImageClassification] TFLite model loaded successfully!")
+            return _model
+        
+        model_path = KERAS_MODEL_PATH
         print(f"[ImageClassification] Loading model from: {model_path}")
         
         if not os.path.exists(model_path):
@@ -150,6 +330,8 @@ def load_model_once():
             return None
         
         _model = load_custom_model(model_path)
+        _infer = build_inference_fn(_model)
+        _model_backend = 'keras'
         _model_loaded = True
         print("[ImageClassification] Model loaded successfully!")
         return _model
@@ -161,6 +343,57 @@ def load_model_once():
         traceback.print_exc()
         return None
 
+# Background model loading so server startup and the first requests are not blocked
+MODEL_WAIT_SECONDS = 0.1
+_model_future = None
+_model_future_lock = threading.Lock()
+
+def start_model_loading():
+    """Start loading the model in a background thread and return its Future"""
+    global _model_future
+    with _model_future_lock:
+        # Retry if a previous attempt finished without a model (same as calling load_model_once again)
+        if _model_future is None or (_model_future.done() and not _model_loaded):
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+            _model_future = executor.submit(load_model_once)
+            executor.shutdown(wait=False)
+        return _model_future
+
+# Prediction cache keyed on a hash of the uploaded image bytes (repeat uploads skip the model)
+PREDICTION_CACHE_SIZE = 1024
+_prediction_cache = OrderedDict()
+_prediction_cache_lock = threading.Lock()
+
+def _image_digest(image_path):
+    """Return a content hash of the image file"""
+    with open(image_path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+def _cache_get(key):
+    with _prediction_cache_lock:
+        result = _prediction_cache.get(key)
+        if result is not None:
+            _prediction_cache.move_to_end(key)
+        return result
+
+def _cache_put(key, result):
+    with _prediction_cache_lock:
+        _prediction_cache[key] = result
+        _prediction_cache.move_to_end(key)
+        while len(_prediction_cache) > PREDICTION_CACHE_SIZE:
+            _prediction_cache.popitem(last=False)
+
+def _filename_fallback(image_path):
+    """Fallback: try to extract the class name from the filename"""
+    basename = os.path.basename(image_path).lower()
+    for class_name_lower, class_name in _CLASS_NAMES_LOWER:
+        if class_name_lower in basename:
+            print(f"[ImageClassification] Fallback detected '{class_name}' in filename")
+            return class_name, 0.5, 'fallback'
+    
+    print("[ImageClassification] Fallback: no class name found in filename")
+    return "Unknown", 0.0, 'fallback'
+
 def classify_image(image_path):
     """
     Classify an uploaded fish image
@@ -176,27 +409,31 @@ def classify_image(image_path):
     """
     print(f"[ImageClassification] classify_image called with: {image_path}")
     
-    # Try to load model
-    model = load_model_once()
+    # Use the model only if it has finished loading; never block the request on it
+    try:
+        model = start_model_loading().result(timeout=MODEL_WAIT_SECONDS)
+    except FutureTimeoutError:
+        print("[ImageClassification] Model still loading, using fallback")
+        return _filename_fallback(image_path)
     
     if model is None:
         print("[ImageClassification] Model not available, using fallback")
-        # Fallback: try to extract from filename
-        basename = os.path.basename(image_path)
-        for class_name in CLASS_NAMES:
-            if class_name.lower() in basename.lower():
-                print(f"[ImageClassification] Fallback detected '{class_name}' in filename")
-                return class_name, 0.5, 'fallback'
-        
-        print("[ImageClassification] Fallback: no class name found in filename")
-        return "Unknown", 0.0, 'fallback'
+        return _filename_fallback(image_path)
     
     # Use model for prediction
     try:
+        cache_key = _image_digest(image_path)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            label, confidence = cached
+            print(f"[ImageClassification] Cache hit: {label} ({confidence:.4f})")
+            return label, confidence, 'dl'
+        
         print("[ImageClassification] Running model prediction...")
         predicted_class_idx, confidence = predict_single_image(model, image_path, CLASS_NAMES)
         label = CLASS_NAMES[predicted_class_idx]
         print(f"[ImageClassification] Prediction complete: {label} ({confidence:.4f})")
+        _cache_put(cache_key, (label, float(confidence)))
         return label, float(confidence), 'dl'
         
     except Exception as e:
@@ -209,8 +446,11 @@ def model_status():
     """Return diagnostic information about model loading status"""
     return {
         'loaded': _model_loaded,
+        'loading': _model_future is not None and not _model_future.done(),
         'error': _model_error,
         'model_available': _model is not None,
+        'backend': _model_backend,
+        'cached_predictions': len(_prediction_cache),
         'class_count': len(CLASS_NAMES),
         'classes': CLASS_NAMES
     }
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for production deployments (Linux/macOS).
+
+Run from the project root:
+
+    gunicorn -c gunicorn_conf.py main:app
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# A single worker process: chat sessions are held in memory per process (and persisted
+# through a per-process writer queue), the model is loaded once, and all classification
+# requests share one micro-batcher. Concurrency comes from threads instead, since chat
+# calls are I/O-bound and inference is already batched.
+# WEB_CONCURRENCY > 1 is unsupported until sessions are rebuilt from SQLite on each request.
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+timeout = 120
+
+if workers > 1:
+    print(f"[Gunicorn] WARNING: WEB_CONCURRENCY={workers} is unsupported; chat sessions "
+          "and the inference batcher are per process")
+
+# Import the app (Flask, TensorFlow, fish data) in the master before forking the worker
+preload_app = True
+
+def post_fork(server, worker):
+    """Load the model in the worker after forking.
+
+    The TensorFlow runtime is not fork-safe, so the model must not be loaded in
+    the master before workers are forked.
+    """
+    from Backend.image_classification import start_model_loading
+    start_model_loading()
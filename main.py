@@ -1,9 +1,11 @@
-from flask import Flask, render_template, send_from_directory, request, jsonify
+from flask import Flask, render_template, send_from_directory, request, jsonify, Response, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import os
+import orjson
 from dotenv import load_dotenv
-from Backend.backend import ChatSessionManager
-from Backend.image_classification import classify_image, model_status
+from Backend.backend import ChatSessionManager, format_timestamp
+from Backend.image_classification import classify_image, model_status, start_model_loading
 from Backend.database.fish_data import get_fish_data
 
 # Load environment variables from .env file
@@ -21,9 +23,25 @@ else:
     print("[Flask] WARNING: GROQ_API_KEY not found!")
 print("="*60 + "\n")
 
+class OrjsonProvider(JSONProvider):
+    """Serialize jsonify() responses and parse request bodies with orjson"""
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Write the bytes straight into the response without a str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.option), mimetype='application/json')
+
 app = Flask(__name__, 
             template_folder='Frontend',
             static_folder='Frontend')
+app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 
 # Initialize chat session manager
@@ -35,6 +53,20 @@ except Exception as e:
     print(f"[Flask] ERROR initializing ChatSessionManager: {e}\n")
     raise
 
+def _scan_frontend(root='Frontend'):
+    """Return the set of servable files under Frontend, as '/'-separated relative paths"""
+    files = set()
+    for dirpath, _, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        for name in filenames:
+            rel_path = name if rel_dir == '.' else os.path.join(rel_dir, name)
+            files.add(rel_path.replace(os.sep, '/'))
+    return files
+
+# Built once at startup so serving a file needs no filesystem lookup
+_FRONTEND_FILES = _scan_frontend()
+print(f"[Flask] Indexed {len(_FRONTEND_FILES)} frontend files")
+
 @app.route('/')
 def index():
     """Serve the main index.html page"""
@@ -48,7 +80,7 @@ def serve_html(filename):
         return "File not found", 404
     
     # Serve other HTML and static files
-    if os.path.exists(os.path.join('Frontend', filename)):
+    if filename in _FRONTEND_FILES:
         return send_from_directory('Frontend', filename)
     return "File not found", 404
 
@@ -114,6 +146,50 @@ def chat():
         }), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Stream the chatbot response as Server-Sent Events
+    Expected JSON format: {"message": "user message", "session_id": "optional_session_id"}
+    Each event is `data: {"content": "..."}`; the stream ends with `data: {"done": true}`
+    or `data: {"error": "..."}`
+    """
+    print("\n" + "="*60)
+    print("[Flask] /api/chat/stream endpoint called")
+    print("="*60)
+    
+    data = request.get_json(silent=True)
+    if not data or 'message' not in data:
+        print("[Flask] ERROR: No message in request data")
+        return jsonify({
+            'success': False,
+            'error': 'No message provided'
+        }), 400
+    
+    user_message = data['message']
+    session_id = data.get('session_id', 'default')
+    print(f"[Flask] User message: {user_message}")
+    print(f"[Flask] Session ID: {session_id}")
+    
+    def generate():
+        try:
+            session = chat_manager.get_session(session_id)
+            for content in session.stream_response(user_message):
+                yield b"data: " + orjson.dumps({'content': content}) + b"\n\n"
+            yield b"data: " + orjson.dumps({'done': True, 'session_id': session_id}) + b"\n\n"
+        except Exception as e:
+            print(f"[Flask] ERROR in /api/chat/stream: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield b"data: " + orjson.dumps({'error': str(e)}) + b"\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/classify', methods=['POST'])
 def classify():
     """Handle image classification requests.
@@ -243,8 +319,11 @@ def get_history():
         session_id = request.args.get('session_id', 'default')
         session = chat_manager.get_session(session_id)
         
-        # Get conversation history (excluding system prompt)
-        history = [msg for msg in session.conversation_history if msg['role'] != 'system']
+        # Get conversation history (the system prompt is kept separately)
+        history = [
+            {**msg, 'timestamp': format_timestamp(msg['timestamp'])}
+            for msg in session.history_snapshot()
+        ]
         
         return jsonify({
             'success': True,
@@ -294,8 +373,14 @@ if __name__ == '__main__':
     print("  - http://localhost:5000/fish-database.html")
     print("API endpoints:")
     print("  - POST /api/chat (send chatbot messages)")
+    print("  - POST /api/chat/stream (stream chatbot response as SSE)")
     print("  - POST /api/chat/clear (clear chat history)")
     print("  - GET /api/chat/history (get chat history)")
     print("=" * 60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Load the classification model in the background so the server can start serving immediately
+    # (under gunicorn this is done per worker in gunicorn_conf.post_fork)
+    print("[Flask] Starting background model loading...")
+    start_model_loading()
+    
+    app.run(host='0.0.0.0', port=5000, threaded=True)